@@ -1,17 +1,22 @@
-import concurrent.futures
+import argparse
 import datetime
 import json
 import os
 import shutil
 
-import frontmatter
-import jinja2
-import markdown
 import requests
 import yaml
-from bs4 import BeautifulSoup
 
+import build_manifest
+import compress
 import create_archives
+import front_matter_cache
+import html_scanner
+import markdown_cache
+import parallel
+import routes
+import sparklines
+import template_environment
 import to_kml
 
 BASE_DIR = "."
@@ -22,6 +27,10 @@ start_time = datetime.datetime.now()
 
 post_directory = "_posts"
 
+# file name -> ((mtime, size), page) for pages already loaded by this process
+# set to a dict by the watch server so rebuilds only load the files that changed
+page_cache = None
+
 
 def get_published_date(url, post_type, published):
     published = ""
@@ -40,27 +49,15 @@ def get_published_date(url, post_type, published):
     return formatted_date
 
 
-# remove _site dir and all files in it
-shutil.rmtree("_site", ignore_errors=True)
-
-# create _site dir
-if not os.path.exists("_site"):
-    os.makedirs("_site")
-
-if not os.path.exists("person_tags.json"):
-    with open("person_tags.json", "w+") as f:
-        f.write("{}")
-
-posts = sorted(
-    os.listdir("_posts"),
-    key=lambda s: "".join([char for char in s if char.isnumeric()]),
-)
-
-
-def create_non_post_files(all_directories, pages_created_count, site_config):
+def load_non_post_files(all_directories, site_config):
     """
-    Create all individual files (i.e. about.html) that aren't posts.
+    Load all individual files (i.e. about.html) that aren't posts and add them to the site collections.
+
+    Returns the render tasks for the pages and the paths of the other files to copy.
     """
+    page_tasks = []
+    static_files = []
+
     do_not_process = ("_posts", "_layouts", "_site", "assets", "_includes", "_drafts")
 
     # templates must be the last directory to process
@@ -151,17 +148,34 @@ def create_non_post_files(all_directories, pages_created_count, site_config):
                 page_type = None
 
             if extension in ("md", "html") and not os.path.isdir(f):
-                process_page(
-                    f,
-                    site_config,
-                    page_type=page_type,
-                    categories=all_categories,
-                    tags=all_tags,
+                page = load_page(f, page_type)
+
+                if page is None:
+                    continue
+
+                add_page_to_site(site_config, page)
+
+                page_tasks.append(
+                    {"page": page, "categories": all_categories, "tags": all_tags}
                 )
             elif extension not in ("py", "pyc", "cfg") and not os.path.isdir(f):
-                shutil.copy(f, OUTPUT + "/" + file_name)
+                static_files.append((f, OUTPUT + "/" + file_name))
 
-            pages_created_count += 1
+    return page_tasks, static_files
+
+
+def create_non_post_files(pages_created_count, site_config, page_tasks, static_files):
+    """
+    Create all individual files (i.e. about.html) that aren't posts.
+    """
+    parallel.run_tasks(site_config, render_page, page_tasks)
+
+    for source, destination in static_files:
+        shutil.copy(source, destination)
+
+        build_manifest.record_output(site_config["manifest"], destination)
+
+    pages_created_count += len(page_tasks) + len(static_files)
 
     return site_config, pages_created_count
 
@@ -172,45 +186,32 @@ def create_template(path, **kwargs):
     """
 
     if path.startswith("_layouts"):
-        template_front_matter = frontmatter.loads(
-            kwargs["site"]["layouts"][path.split("/")[-1]]
+        template_metadata, new_template = template_environment.get_layout(
+            path.split("/")[-1]
         )
     else:
-        template_front_matter = frontmatter.load(path)
-
-    loader = jinja2.FileSystemLoader(searchpath="./")
+        template_front_matter = front_matter_cache.load(path)
 
-    template = jinja2.Environment(loader=loader)
-
-    # register filter
-    template.filters["long_date"] = create_archives.long_date
-    template.filters["date_to_xml_string"] = create_archives.date_to_xml_string
-    template.filters["archive_date"] = create_archives.archive_date
-    template.filters["list_archive_date"] = create_archives.list_archive_date
+        if path.endswith(".md"):
+            template_front_matter.content = markdown_cache.convert(
+                template_front_matter.content
+            )
 
-    if path.endswith(".md"):
-        template_front_matter.content = markdown.markdown(template_front_matter.content)
+        template_metadata = template_front_matter.metadata
 
-    new_template = template.from_string(template_front_matter.content)
+        new_template = template_environment.environment.from_string(
+            template_front_matter.content
+        )
 
     kwargs.get("page", {})["today"] = str(datetime.datetime.now().strftime("%Y%m%d"))
 
     if kwargs.get("end_date"):
         kwargs["page"]["end_date_formatted"] = kwargs["end_date"].strftime("%Y-%m-%d")
 
-    if template_front_matter.metadata.get("layout"):
-        if type(kwargs["site"]) == dict:
-            parent_front_matter = frontmatter.loads(
-                kwargs["site"]["layouts"][
-                    template_front_matter.metadata["layout"] + ".html"
-                ]
-            )
-        else:
-            parent_front_matter = frontmatter.loads(
-                "_layouts/" + template_front_matter.metadata["layout"] + ".html"
-            )
-
-        parent_template = template.from_string(parent_front_matter.content)
+    if template_metadata.get("layout"):
+        parent_metadata, parent_template = template_environment.get_layout(
+            template_metadata["layout"] + ".html"
+        )
 
         new_template = parent_template.render(
             content=new_template.render(kwargs), **kwargs
@@ -218,9 +219,9 @@ def create_template(path, **kwargs):
 
         kwargs["content"] = new_template
 
-        if parent_front_matter.metadata.get("layout"):
+        if parent_metadata.get("layout"):
             template = create_template(
-                "_layouts/" + parent_front_matter.metadata["layout"] + ".html", **kwargs
+                "_layouts/" + parent_metadata["layout"] + ".html", **kwargs
             )
         else:
             template = new_template
@@ -230,39 +231,52 @@ def create_template(path, **kwargs):
     return template
 
 
-def process_page(
-    file_name,
-    site_config,
-    page_type=None,
-    previous_page=None,
-    next_post=None,
-    next_post_url=None,
-    person_tags={},
-    categories=[],
-    tags=[],
-):
+def load_page(file_name, page_type=None):
+    """
+    Return a page's entry in the site index, or None if the page is not generated.
 
-    front_matter = frontmatter.load(file_name)
+    If page_cache is enabled, a file is only read again when it changes.
+    """
+    if page_cache is None:
+        return read_page(file_name, page_type)
 
-    if previous_page:
-        front_matter.metadata["previous"] = {
-            "title": previous_page.metadata["title"],
-            "url": previous_page.metadata["url"],
-        }
+    stat = os.stat(file_name)
+    key = (stat.st_mtime_ns, stat.st_size, page_type)
 
-    else:
-        front_matter.metadata["previous"] = {"title": "", "url": ""}
+    entry = page_cache.get(file_name)
 
-    if next_post is not None:
-        front_matter.metadata["next"] = {
-            "title": next_post["title"],
-            "url": next_post_url,
-        }
-    else:
-        front_matter.metadata["next"] = {"title": "", "url": ""}
+    if entry is None or entry[0] != key:
+        page = read_page(file_name, page_type)
+
+        # pages scheduled for the future are checked again on the next build
+        if page is None:
+            page_cache.pop(file_name, None)
+
+            return None
+
+        entry = (key, page)
+
+        page_cache[file_name] = entry
+
+    # later steps set the previous and next links, so each build gets its own metadata
+    return {**entry[1], "metadata": dict(entry[1]["metadata"])}
+
+
+def read_page(file_name, page_type=None):
+    """
+    Read a page and work out its url, dates, excerpt, and categories without rendering it.
+
+    Returns the page's entry in the site index, or None if the page is not generated.
+    """
+
+    front_matter = front_matter_cache.load(file_name)
+
+    # filled in by link_posts once every post has been loaded
+    front_matter.metadata["previous"] = {"title": "", "url": ""}
+    front_matter.metadata["next"] = {"title": "", "url": ""}
 
     if front_matter.metadata == {}:
-        return site_config
+        return None
 
     front_matter.metadata["categories"] = front_matter.metadata.get("categories", [])
 
@@ -276,20 +290,24 @@ def process_page(
         ] + front_matter.metadata.get("category", [])
 
     if file_name.endswith(".md"):
-        front_matter.content = markdown.markdown(front_matter.content)
+        front_matter.content = markdown_cache.convert(front_matter.content)
 
-    soup = BeautifulSoup(front_matter.content, "lxml")
+    # images are only collected from articles, so other pages stop scanning after the first paragraph
+    is_article = (
+        "Post" in front_matter.metadata["categories"]
+        and front_matter.metadata.get("hidden") != "true"
+    )
 
-    images = soup.find_all("img")
+    first_paragraph, first_paragraph_text, images = html_scanner.scan(
+        front_matter.content, find_images=is_article
+    )
 
     # first paragraph sentences will be considered "excerpt" value
 
     # .replace(" @", "") removes @ mentions
     # @ mentions are not parsed at this time so they should not be formatted as raw @ mentions in the excerpts
 
-    front_matter.metadata["excerpt"] = " ".join(
-        [str(sentence) for sentence in soup.find_all("p")[:1]]
-    ).replace(" @", "")
+    front_matter.metadata["excerpt"] = first_paragraph.replace(" @", "")
 
     # use first sentence for meta description
     if front_matter.metadata.get("meta_description") is None:
@@ -299,19 +317,10 @@ def process_page(
         )
 
     if front_matter.metadata.get("description") is None:
-        front_matter.metadata["description"] = " ".join(
-            [sentence.text for sentence in soup.find_all("p")[:1]]
-        ).replace(" @", "")
+        front_matter.metadata["description"] = first_paragraph_text.replace(" @", "")
 
     if not front_matter.metadata.get("layout"):
-        return
-
-    if site_config.get(front_matter.metadata["layout"]) is not None:
-        site_config[front_matter.metadata["layout"]] = site_config[
-            front_matter.metadata["layout"]
-        ] + [front_matter.metadata]
-
-    print("Generating " + file_name)
+        return None
 
     if (
         not front_matter.metadata.get("title")
@@ -345,10 +354,7 @@ def process_page(
             datetime.datetime.strptime(year + "-" + month + "-" + day, "%Y-%m-%d")
             > datetime.datetime.now()
         ):
-            return site_config
-
-        site_config["years"].append(year)
-        site_config["months"].append(month)
+            return None
 
         front_matter.metadata["date"] = datetime.datetime.strptime(
             year + "-" + month + "-" + day, "%Y-%m-%d"
@@ -415,6 +421,7 @@ def process_page(
 
     front_matter.metadata["url"] = url
     front_matter.metadata["slug"] = url
+    front_matter.metadata["path"] = file_name
 
     if "Post" in front_matter.metadata["categories"]:
         post_type = "article"
@@ -462,27 +469,70 @@ def process_page(
 
     front_matter.metadata["page_tags"] = "".join(page_tags)
 
-    rendered_string = create_template(
-        file_name,
-        site=site_config,
-        page=front_matter.metadata,
-        paginator=None,
-        person_tags=person_tags,
-        page_type=page_type,
-        categories=categories,
-        tags=tags,
-    )
+    photos = []
 
     if post_type == "article" and front_matter.metadata.get("hidden") != "true":
         for image in images:
-            site_config["photos"] = site_config["photos"] + [
+            photos.append(
                 {
                     "alt": image["alt"],
                     "src": image["src"],
                     "page_url": url,
                     "published": front_matter.metadata["full_date"],
                 }
-            ]
+            )
+
+    return {
+        "file_name": file_name,
+        "page_type": page_type,
+        "path_to_save": path_to_save,
+        "metadata": front_matter.metadata,
+        "photos": photos,
+    }
+
+
+def render_page(page, site_config, person_tags={}, categories=[], tags=[]):
+    """
+    Render a page from the site index and save it, without changing site_config.
+    """
+    file_name = page["file_name"]
+    path_to_save = page["path_to_save"]
+    metadata = page["metadata"]
+
+    # pages outside _posts list site collections and series posts have their
+    # fragment spliced in after rendering, so only plain posts can be skipped
+    is_unchanged = not build_manifest.needs_rebuild(
+        site_config["manifest"],
+        path_to_save,
+        build_manifest.page_inputs(
+            site_config["manifest"],
+            site_config,
+            file_name,
+            neighbours=build_manifest.hash_string(
+                json.dumps([metadata["previous"], metadata["next"]], sort_keys=True)
+            ),
+        ),
+    )
+
+    is_series_post = any("(Series)" in c for c in metadata["categories"])
+
+    if page["page_type"] == "post" and is_unchanged and not is_series_post:
+        print("Skipping unchanged " + file_name)
+
+        return
+
+    print("Generating " + file_name)
+
+    rendered_string = create_template(
+        file_name,
+        site=site_config,
+        page=metadata,
+        paginator=None,
+        person_tags=person_tags,
+        page_type=page["page_type"],
+        categories=categories,
+        tags=tags,
+    )
 
     dir_to_save = "/".join(path_to_save.split("/")[:-1])
 
@@ -492,87 +542,130 @@ def process_page(
     with open(path_to_save, "w+") as file:
         file.write(rendered_string)
 
-    site_config["pages"] +=  [front_matter.metadata["url"]]
 
-    if page_type == "post" or "note" in front_matter.metadata["categories"]:
-        site_config["posts"] += [front_matter.metadata]
+def add_page_to_site(site_config, page):
+    """
+    Add a page from the site index to the site collections.
+    """
+    file_name = page["file_name"]
+    page_type = page["page_type"]
+    metadata = page["metadata"]
+
+    # collections are only ever appended to, so adding a page does not copy them
+
+    if site_config.get(metadata["layout"]) is not None:
+        site_config[metadata["layout"]].append(metadata)
+
+    if page_type == "post" or "note" in metadata["categories"] or page_type == "poll":
+        file = file_name.split("/")[-1]
 
-        for category in front_matter.metadata["categories"]:
+        site_config["years"].append(file.split("-")[0])
+        site_config["months"].append(file.split("-")[1])
+
+    site_config["photos"].extend(page["photos"])
+
+    site_config["pages"].append(metadata["url"])
+
+    if page_type == "post" or "note" in metadata["categories"]:
+        site_config["posts"].append(metadata)
+
+        for category in metadata["categories"]:
             if "(Series)" in category:
                 site_config["series_posts"].append(
                     [
-                        front_matter.metadata["categories"][0],
+                        metadata["categories"][0],
                         file_name.replace("_posts", ""),
-                        front_matter.metadata["url"],
+                        metadata["url"],
                     ]
                 )
-            
-            site_config["categories"][category] = site_config["categories"].get(category, [])  + [front_matter.metadata]
 
-    for tag in front_matter.metadata.get("tags", []):
-        site_config["tags"][tag] = site_config["tags"].get(tag.lower(), []) + [
-            front_matter.metadata
-        ]
+            site_config["categories"].setdefault(category, []).append(metadata)
+
+    for tag in metadata.get("tags", []):
+        site_config["tags"].setdefault(tag, []).append(metadata)
 
-    for c in front_matter.metadata["categories"]:
-        site_config[c.lower()] = site_config.get(c.lower(), []) + [front_matter.metadata]
+    for c in metadata["categories"]:
+        site_config.setdefault(c.lower(), []).append(metadata)
 
-    return site_config, front_matter
+    return site_config
 
 
-def create_posts(pages_created_count, site_config):
+def process_page(file_name, site_config, page_type=None, **kwargs):
     """
-    Get all posts and execute process_page function to create them.
+    Load a page, add it to the site collections, and render it.
     """
-    post_files = posts
+    page = load_page(file_name, page_type)
 
-    previous_page = None
+    if page is None:
+        return site_config
 
-    with open("person_tags.json", "r") as f:
-        person_tags = json.load(f)
+    add_page_to_site(site_config, page)
 
-    tasks = []
+    render_page(page, site_config, **kwargs)
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=15) as executor:
-        for post_item in range(0, len(post_files)):
-            post_file = post_files[post_item]
+    return site_config
 
-            path = post_directory + "/" + post_file
 
-            # do not copy dotfiles into site
-            if post_file.startswith("."):
-                continue
+def load_posts(site_config):
+    """
+    Load every post and add it to the site collections.
 
-            if len(post_files) < post_item + 1:
-                next_post_url = post_directory + "/" + post_files[post_item + 1]
+    Returns the site index entries of the posts that will be generated, oldest first.
+    """
+    post_pages = []
 
-                next_post = frontmatter.load(next_post_url)
-            else:
-                next_post_url = None
-                next_post = None
-
-            tasks.append(
-                executor.submit(
-                    process_page,
-                    path,
-                    site_config,
-                    "post",
-                    previous_page,
-                    next_post,
-                    next_post_url,
-                    person_tags,
-                )
-            )
+    posts = sorted(
+        os.listdir(post_directory),
+        key=lambda s: "".join([char for char in s if char.isnumeric()]),
+    )
+
+    for post_file in posts:
+        # do not copy dotfiles into site
+        if post_file.startswith("."):
+            continue
+
+        page = load_page(post_directory + "/" + post_file, "post")
 
-            previous_page = ""
+        if page is None:
+            continue
+
+        add_page_to_site(site_config, page)
+
+        post_pages.append(page)
 
-            pages_created_count += 1
+    link_posts(post_pages)
 
-    for _ in concurrent.futures.as_completed(tasks):
-        try:
-            pages_created_count += 1
-        except Exception as exc:
-            raise exc
+    return post_pages
+
+
+def link_posts(post_pages):
+    """
+    Add previous and next post links to every post.
+    """
+    for previous_page, page in zip(post_pages, post_pages[1:]):
+        page["metadata"]["previous"] = {
+            "title": previous_page["metadata"].get("title", ""),
+            "url": previous_page["metadata"]["url"],
+        }
+
+        previous_page["metadata"]["next"] = {
+            "title": page["metadata"].get("title", ""),
+            "url": page["metadata"]["url"],
+        }
+
+
+def create_posts(pages_created_count, site_config, post_pages):
+    """
+    Render every post loaded by load_posts.
+    """
+    with open("person_tags.json", "r") as f:
+        person_tags = json.load(f)
+
+    tasks = [{"page": page, "person_tags": person_tags} for page in post_pages]
+
+    parallel.run_tasks(site_config, render_page, tasks)
+
+    pages_created_count += len(tasks)
 
     return site_config, pages_created_count
 
@@ -583,16 +676,14 @@ def render_series_fragment(site_config):
     """
     series_fragment = open("_includes/posts_in_series.html", "r").read()
 
+    series_template = template_environment.environment.get_template(
+        "_includes/posts_in_series.html"
+    )
+
     for post_object in site_config["series_posts"]:
         print("Generating 'Other posts in this series' fragment for " + post_object[1])
         category, post_name, page_url = post_object
 
-        loader = jinja2.FileSystemLoader(searchpath="./")
-
-        template = jinja2.Environment(loader=loader)
-
-        rendered_series_text = template.from_string(series_fragment)
-
         posts_to_show = site_config["categories"].get(category)
 
         see_more_link = False
@@ -604,7 +695,7 @@ def render_series_fragment(site_config):
             category.replace(" ", "-").lower().replace("(", "").replace(")", "")
         )
 
-        rendered_series_text = rendered_series_text.render(
+        rendered_series_text = series_template.render(
             posts_in_series=posts_to_show[:10],
             see_more_link=see_more_link,
             site=site_config,
@@ -631,12 +722,43 @@ def render_series_fragment(site_config):
     return series_fragment
 
 
-def main():
+def main(
+    full_rebuild=False,
+    bytecode_cache=False,
+    jobs=1,
+    persist_front_matter=False,
+    previous_manifest=None,
+    precompress=False,
+):
     """
     Main function.
+
+    Pages whose inputs are unchanged since the last build are not rendered again
+    unless full_rebuild is True. If bytecode_cache is True, compiled templates are
+    kept on disk between builds, and if persist_front_matter is True, so is parsed
+    front matter. Pages are rendered in jobs processes. If precompress is True, .gz
+    and .br copies of text files are written next to them for the server.
+
+    previous_manifest is the manifest of the last build made by this process, if any.
+    Returns site_config.
     """
     pages_created_count = 0
 
+    manifest = build_manifest.load_manifest(
+        full_rebuild, previous_manifest=previous_manifest
+    )
+
+    # without a manifest we cannot tell which files are stale, so start from scratch
+    if not manifest["previous"]:
+        shutil.rmtree(OUTPUT, ignore_errors=True)
+
+    if not os.path.exists(OUTPUT):
+        os.makedirs(OUTPUT)
+
+    if not os.path.exists("person_tags.json"):
+        with open("person_tags.json", "w+") as f:
+            f.write("{}")
+
     site_config = yaml.load(open("config.yml", "r"), Loader=yaml.FullLoader)
 
     cafes = to_kml.transform_cafes_to_string_kml_file()
@@ -674,6 +796,8 @@ def main():
         "layouts": {},
         "photos": [],
         "checkin": [],
+        "manifest": manifest,
+        "jobs": jobs,
     }
 
     site_config = {**site_config, **new_items}
@@ -689,7 +813,19 @@ def main():
         with open("_layouts/" + l, "r") as file:
             site_config["layouts"][l] = file.read()
 
-    site_config, pages_created_count = create_posts(pages_created_count, site_config)
+    template_environment.register_layouts(site_config["layouts"])
+
+    if bytecode_cache:
+        template_environment.enable_bytecode_cache()
+
+    if persist_front_matter and not full_rebuild:
+        front_matter_cache.load_cache()
+
+    build_manifest.set_global_inputs(manifest, site_config)
+
+    # first pass: load every page and build the site index
+
+    post_pages = load_posts(site_config)
 
     posts = site_config["posts"]
 
@@ -708,10 +844,18 @@ def main():
             key=lambda x: x["full_date"], reverse=True
         )
 
+    page_tasks, static_files = load_non_post_files(all_directories, site_config)
+
+    # second pass: render every page from the complete site index
+
+    site_config, pages_created_count = create_posts(
+        pages_created_count, site_config, post_pages
+    )
+
     render_series_fragment(site_config)
 
     site_config, pages_created_count = create_non_post_files(
-        all_directories, pages_created_count, site_config
+        pages_created_count, site_config, page_tasks, static_files
     )
 
     if site_config.get("auto_generate"):
@@ -724,28 +868,6 @@ def main():
                 site_config, OUTPUT, pages_created_count, page_type="tag"
             )
 
-        if "pagination" in site_config["auto_generate"]:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=15) as executor:
-                futures = []
-
-                for category, entries in site_config["categories"].items():
-                    futures.append(
-                        executor.submit(
-                            create_archives.create_category_pages,
-                            site_config,
-                            OUTPUT,
-                            pages_created_count,
-                            entries,
-                            category,
-                        )
-                    )
-
-                for _ in concurrent.futures.as_completed(futures):
-                    try:
-                        pages_created_count += 1
-                    except Exception as exc:
-                        raise exc
-
         if "date_archive" in site_config["auto_generate"]:
             (
                 site_config,
@@ -764,8 +886,14 @@ def main():
     if os.path.exists("templates/robots.txt"):
         shutil.copyfile("templates/robots.txt", "_site/robots.txt")
 
+        build_manifest.record_output(manifest, "_site/robots.txt")
+
     if os.path.exists("assets"):
-        shutil.copytree("assets", "_site/assets")
+        shutil.copytree("assets", "_site/assets", dirs_exist_ok=True)
+
+        for root, _, files in os.walk("_site/assets"):
+            for file in files:
+                build_manifest.record_output(manifest, root + "/" + file)
 
     # remove config files from _site
     for file in os.listdir("_site"):
@@ -776,35 +904,17 @@ def main():
 
     collections_to_build_sparklines_for = ["posts"]
 
-    sparklines = ""
+    sparkline_markup = ""
 
     for c in collections_to_build_sparklines_for:
-        dates = {}
-
-        for i in range(0, 90):
-            dates[
-                (datetime.datetime.now() - datetime.timedelta(days=i)).strftime(
-                    "%Y-%m-%d"
-                )
-            ] = 0
-
-        for post in site_config[c]:
-            if c == "posts":
-                date = post["date"].strftime("%Y-%m-%d")
-            else:
-                date = datetime.datetime.strptime(
-                    post["full_date"], "%Y-%m-%d %H:%M:%S-00:00"
-                ).strftime("%Y-%m-%d")
-
-            if dates.get(date) is not None:
-                dates[date] += 1
-
-        values = dates.values()
-
-        # convert values to list
-        data_points = list(values)
+        if c == "posts":
+            days_published = [
+                post["date"].strftime("%Y-%m-%d") for post in site_config[c]
+            ]
+        else:
+            days_published = [sparklines.post_day(post) for post in site_config[c]]
 
-        data_points.reverse()
+        data_points = sparklines.daily_counts(days_published, 90)
 
         number_of_posts = len(site_config[c])
 
@@ -822,7 +932,7 @@ def main():
         else:
             wiki_sparkline_url = ""
 
-        sparklines += f"""
+        sparkline_markup += f"""
         <p><a href="{url}">{number_of_posts} {c.title()}</a> <embed class="light_mode" src="/assets/sparkline.svg?{','.join([str(val) for val in data_points])}"
         class="sparkline" width=100 height=15 /></p>
         <p><a href="https://indieweb.org/User:Jamesg.blog">IndieWeb Wiki Contributions</a> <embed class="light_mode" src="{wiki_sparkline_url}"
@@ -834,11 +944,28 @@ def main():
     with open("_site/index.html", "r") as file:
         file_content = file.read()
 
-    file_content = file_content.replace("<!--- sparkline -->", sparklines)
+    file_content = file_content.replace("<!--- sparkline -->", sparkline_markup)
 
     with open("_site/index.html", "w") as file:
         file.write(file_content)
 
+    if precompress:
+        compress.compress_outputs(site_config)
+
+    stale_outputs = build_manifest.remove_stale_outputs(manifest)
+
+    build_manifest.save_manifest(manifest)
+    build_manifest.save_dependency_graph(manifest)
+
+    routes.save_routes(manifest, OUTPUT)
+
+    if persist_front_matter:
+        front_matter_cache.save_cache()
+
+    markdown_cache.evict()
+
+    print("Stale pages removed: " + str(stale_outputs))
+
     print("Pages generated: " + str(pages_created_count))
 
     per_second = str(
@@ -850,9 +977,52 @@ def main():
 
     print("Pages generated per second: " + str(per_second))
 
+    return site_config
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build the static site.")
+
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="ignore the build manifest and render every page again",
+    )
+
+    parser.add_argument(
+        "--bytecode-cache",
+        action="store_true",
+        help="keep compiled templates in .letsjam/jinja between builds",
+    )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes used to render pages",
+    )
+
+    parser.add_argument(
+        "--front-matter-cache",
+        action="store_true",
+        help="keep parsed front matter in .letsjam between builds",
+    )
+
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="write .gz and .br copies of HTML, CSS, JS, XML, and JSON files",
+    )
+
+    args = parser.parse_args()
+
+    main(
+        full_rebuild=args.full,
+        bytecode_cache=args.bytecode_cache,
+        jobs=args.jobs,
+        persist_front_matter=args.front_matter_cache,
+        precompress=args.precompress,
+    )
 
     end_time = datetime.datetime.now()
 
@@ -0,0 +1,209 @@
+"""
+An ASGI version of server.py, for serving the site with many clients at once.
+
+Run it with any ASGI server from the folder that contains _site, i.e.:
+
+    uvicorn asgi:app --workers 4
+
+Set LETSJAM_CACHE_SIZE to a number of megabytes to turn on the response cache.
+"""
+import asyncio
+import email.utils
+import json
+import os
+
+from werkzeug.utils import get_content_type
+
+import response_cache
+import server
+
+CHUNK_SIZE = 64 * 1024
+
+if int(os.environ.get("LETSJAM_CACHE_SIZE", 0)) > 0:
+    server.cache = response_cache.ResponseCache(
+        int(os.environ["LETSJAM_CACHE_SIZE"]) * 1024 * 1024
+    )
+
+
+def request_header(scope, name):
+    for header_name, value in scope["headers"]:
+        if header_name == name:
+            return value.decode("latin-1")
+
+    return ""
+
+
+def etag_matches(header, etag):
+    """
+    Return True if an If-None-Match header lists etag.
+    """
+    for value in header.split(","):
+        value = value.strip()
+
+        if value == "*" or value.removeprefix("W/").strip('"') == etag:
+            return True
+
+    return False
+
+
+def response_headers(route, variant, encoding):
+    """
+    Return the same headers server.py sends for a file.
+    """
+    headers = [
+        (b"content-type", get_content_type(route["content_type"], "utf-8").encode()),
+        (b"etag", f'"{variant["etag"]}"'.encode()),
+        (
+            b"last-modified",
+            email.utils.formatdate(variant["mtime"], usegmt=True).encode(),
+        ),
+        (b"cache-control", server.cache_control(route).encode()),
+    ]
+
+    if encoding:
+        headers.append((b"content-encoding", encoding.encode()))
+
+    if route["encodings"]:
+        headers.append((b"vary", b"Accept-Encoding"))
+
+    return headers
+
+
+async def send_response(send, status, headers, body=b""):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, data):
+    body = json.dumps(data).encode()
+
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+
+    await send_response(send, 200, headers, body)
+
+
+async def send_file_body(scope, send, path, size):
+    """
+    Send a file without loading all of it into memory.
+
+    The ASGI server sends the file itself with sendfile if it supports the
+    pathsend or zerocopysend extension; otherwise the file is read in chunks
+    in a thread so the event loop is never blocked on disk.
+    """
+    extensions = scope.get("extensions") or {}
+
+    if "http.response.pathsend" in extensions:
+        await send({"type": "http.response.pathsend", "path": os.path.abspath(path)})
+        return
+
+    if "http.response.zerocopysend" in extensions:
+        with open(path, "rb") as file:
+            await send({"type": "http.response.zerocopysend", "file": file})
+        return
+
+    with open(path, "rb") as file:
+        sent = 0
+
+        while True:
+            chunk = await asyncio.to_thread(file.read, CHUNK_SIZE)
+
+            sent += len(chunk)
+
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": bool(chunk) and sent < size,
+                }
+            )
+
+            if not chunk or sent >= size:
+                return
+
+
+async def read_cached(variant):
+    """
+    Return a file's body from the server's response cache, reading it on a miss.
+    """
+    key = (variant["path"], variant["etag"])
+
+    body = server.cache.get(key)
+
+    if body is None:
+        with open(variant["path"], "rb") as file:
+            body = await asyncio.to_thread(file.read)
+
+        server.cache.put(key, body, len(body))
+
+    return body
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    if scope["method"] not in ("GET", "HEAD"):
+        await send_response(send, 405, [(b"allow", b"GET, HEAD")])
+        return
+
+    if scope["path"] == "/_stats":
+        if server.cache is None:
+            await send_json(send, {"enabled": False})
+        else:
+            await send_json(send, {"enabled": True, **server.cache.stats()})
+
+        return
+
+    route = server.find_route(scope["path"][1:])
+
+    if route is None:
+        await send_response(send, 404, [(b"content-type", b"text/plain")], b"Not Found")
+        return
+
+    if "redirect" in route:
+        await send_response(send, 301, [(b"location", route["redirect"].encode())])
+        return
+
+    accepted = server.accepted_encodings(request_header(scope, b"accept-encoding"))
+
+    encoding = None
+    variant = route
+
+    for name in server.ENCODINGS:
+        if name in accepted and name in route["encodings"]:
+            encoding = name
+            variant = route["encodings"][name]
+            break
+
+    headers = response_headers(route, variant, encoding)
+
+    if etag_matches(request_header(scope, b"if-none-match"), variant["etag"]):
+        await send_response(send, 304, headers)
+        return
+
+    headers.append((b"content-length", str(variant["size"]).encode()))
+
+    if scope["method"] == "HEAD":
+        await send_response(send, 200, headers)
+        return
+
+    if server.cache is not None and variant["size"] <= server.cache.max_entry_bytes:
+        await send_response(send, 200, headers, await read_cached(variant))
+        return
+
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    await send_file_body(scope, send, variant["path"], variant["size"])
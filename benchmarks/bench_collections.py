@@ -0,0 +1,80 @@
+"""
+Times adding synthetic posts to the site collections and grouping them by date.
+
+Run from the folder that contains your site's config.yml:
+
+    python3 benchmarks/bench_collections.py
+
+If collections grow in linear time, the time per post stays about the same as the
+number of posts grows.
+"""
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import create_archives
+
+SIZES = [1000, 10000, 100000]
+CATEGORIES = ["Post", "Coffee", "Tea", "Travel", "Web"]
+TAGS = ["coffee", "tea", "indieweb"]
+
+
+def synthetic_page(number):
+    date = datetime.datetime(2015, 1, 1) + datetime.timedelta(days=number // 3)
+    url = date.strftime("/%Y/%m/%d/") + f"post-{number}/"
+
+    return {
+        "file_name": "_posts/" + date.strftime("%Y-%m-%d-") + f"post-{number}.md",
+        "page_type": "post",
+        "path_to_save": "_site" + url + "index.html",
+        "metadata": {
+            "layout": "post",
+            "title": f"Post {number}",
+            "url": url,
+            "categories": [CATEGORIES[0], CATEGORIES[1 + number % 4]],
+            "tags": [TAGS[number % 3]],
+            "full_date": date.strftime("%Y-%m-%d %H:%M:%S-00:00"),
+        },
+        "photos": [],
+    }
+
+
+def empty_site_config():
+    return {
+        "pages": [],
+        "posts": [],
+        "photos": [],
+        "years": [],
+        "months": [],
+        "categories": {},
+        "tags": {},
+        "series_posts": [],
+    }
+
+
+def main():
+    for size in SIZES:
+        pages = [synthetic_page(number) for number in range(size)]
+
+        site_config = empty_site_config()
+
+        start = time.perf_counter()
+
+        for page in pages:
+            app.add_page_to_site(site_config, page)
+
+        create_archives.group_posts_by_date(site_config["posts"])
+
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"{size} posts: {elapsed:.3f}s ({elapsed / size * 1000000:.2f} microseconds per post)"
+        )
+
+
+if __name__ == "__main__":
+    main()
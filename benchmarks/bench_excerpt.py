@@ -0,0 +1,74 @@
+"""
+Times finding the excerpt and images of long posts with BeautifulSoup and with html_scanner.
+
+    python3 benchmarks/bench_excerpt.py
+
+html_scanner stops reading a page after the first paragraph when images are not needed,
+so its time should barely grow with the length of the post.
+"""
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_scanner
+
+PARAGRAPHS = [10, 100, 1000]
+RUNS = 20
+
+
+def synthetic_post(paragraphs):
+    body = [
+        "<p>This is the first paragraph of the post. It has <a href='/about/'>a link</a> and <em>emphasis</em>.</p>"
+    ]
+
+    for number in range(paragraphs):
+        body.append(f"<h2>Section {number}</h2>")
+        body.append(
+            f"<p>Paragraph {number} talks about coffee &amp; tea. " * 5 + "</p>"
+        )
+        body.append(f'<img src="/assets/{number}.jpg" alt="Photo {number}">')
+
+    return "\n".join(body)
+
+
+def with_beautifulsoup(document):
+    soup = BeautifulSoup(document, "lxml")
+
+    paragraphs = soup.find_all("p")[:1]
+
+    return (
+        " ".join(str(paragraph) for paragraph in paragraphs),
+        " ".join(paragraph.text for paragraph in paragraphs),
+        soup.find_all("img"),
+    )
+
+
+def time_function(function, document, **kwargs):
+    start = time.perf_counter()
+
+    for _ in range(RUNS):
+        function(document, **kwargs)
+
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def main():
+    print(f"{'paragraphs':>10} {'bs4':>10} {'scanner':>10} {'no images':>10}  (ms per post)")
+
+    for paragraphs in PARAGRAPHS:
+        document = synthetic_post(paragraphs)
+
+        print(
+            f"{paragraphs:>10} "
+            f"{time_function(with_beautifulsoup, document):>10.2f} "
+            f"{time_function(html_scanner.scan, document):>10.2f} "
+            f"{time_function(html_scanner.scan, document, find_images=False):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
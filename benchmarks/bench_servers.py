@@ -0,0 +1,98 @@
+"""
+Compares the Flask server with the ASGI server on the same site.
+
+Build the site, then run from the folder that contains _site:
+
+    pip3 install uvicorn
+    python3 benchmarks/bench_servers.py --paths / /archive/ /assets/large-photo.jpg
+
+Each server is started in turn, loaded with the same requests, and stopped.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import load_test
+
+SERVERS = {
+    "flask": [
+        sys.executable,
+        os.path.join(REPOSITORY_DIR, "server.py"),
+        "--port",
+        "{port}",
+    ],
+    "asgi": [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "--app-dir",
+        REPOSITORY_DIR,
+        "--port",
+        "{port}",
+        "--log-level",
+        "warning",
+        "asgi:app",
+    ],
+}
+
+
+def wait_until_ready(url, timeout=15):
+    deadline = time.time() + timeout
+
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + "/_stats")
+            return True
+        except OSError:
+            time.sleep(0.1)
+
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Flask and ASGI servers.")
+
+    parser.add_argument("--paths", nargs="+", default=["/"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=5050)
+
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+
+    print(f"{'server':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>8}")
+
+    for name, command in SERVERS.items():
+        command = [part.replace("{port}", str(args.port)) for part in command]
+
+        process = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+        try:
+            if not wait_until_ready(url):
+                print(f"{name:>8} did not start (is it installed?)")
+                continue
+
+            result = load_test.run(url, args.paths, args.concurrency, args.duration)
+
+            print(
+                f"{name:>8} {result['requests_per_second']:>10} {result['p50_ms']:>8}"
+                f" {result['p99_ms']:>8} {result['errors']:>8}"
+            )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Sends requests to a running server from several threads and reports requests per second.
+
+Start the server from the folder that contains your site, then run:
+
+    python3 server.py
+    python3 benchmarks/load_test.py --url http://localhost:5000 --paths / /archive/ /sitemap.xml
+
+Run it once against a build made with --precompress and once without, or against two
+versions of server.py, to compare them. Pass --accept-encoding "" to request
+uncompressed responses.
+"""
+import argparse
+import http.client
+import threading
+import time
+import urllib.parse
+
+
+def worker(url, paths, headers, deadline, results):
+    parsed = urllib.parse.urlparse(url)
+
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+
+    latencies = []
+    errors = 0
+    received = 0
+    request_number = 0
+
+    while time.perf_counter() < deadline:
+        path = paths[request_number % len(paths)]
+        request_number += 1
+
+        start = time.perf_counter()
+
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            received += len(response.read())
+        except (ConnectionError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+            continue
+
+        latencies.append(time.perf_counter() - start)
+
+        if response.status >= 400:
+            errors += 1
+
+    connection.close()
+
+    results.append((latencies, errors, received))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(url, paths, concurrency=8, duration=10, accept_encoding="br, gzip"):
+    """
+    Request paths from url in concurrency threads for duration seconds and return the results.
+    """
+    headers = {}
+
+    if accept_encoding:
+        headers["Accept-Encoding"] = accept_encoding
+
+    deadline = time.perf_counter() + duration
+
+    results = []
+
+    threads = [
+        threading.Thread(target=worker, args=(url, paths, headers, deadline, results))
+        for _ in range(concurrency)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    received = sum(result[2] for result in results)
+
+    return {
+        "requests": len(latencies),
+        "errors": sum(result[1] for result in results),
+        "requests_per_second": round(len(latencies) / duration, 2),
+        "bytes_per_request": round(received / max(1, len(latencies))),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a letsjam server.")
+
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--paths", nargs="+", default=["/"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--accept-encoding", default="br, gzip")
+
+    args = parser.parse_args()
+
+    result = run(
+        args.url, args.paths, args.concurrency, args.duration, args.accept_encoding
+    )
+
+    print(f"Requests: {result['requests']} ({result['errors']} errors)")
+    print(f"Requests per second: {result['requests_per_second']}")
+    print(f"Bytes per request: {result['bytes_per_request']}")
+    print(f"Latency p50: {result['p50_ms']} ms")
+    print(f"Latency p99: {result['p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
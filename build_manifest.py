@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+
+import jinja2
+from jinja2 import meta
+
+import front_matter_cache
+import template_environment
+
+MANIFEST_DIR = ".letsjam"
+MANIFEST_PATH = MANIFEST_DIR + "/manifest.json"
+DEPENDENCIES_PATH = MANIFEST_DIR + "/dependencies.json"
+
+
+def hash_string(value):
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def hash_file(manifest, path):
+    """
+    Return the content hash of a file, computing it at most once per build.
+    """
+    if path not in manifest["hashes"]:
+        with open(path, "rb") as file:
+            manifest["hashes"][path] = hashlib.sha256(file.read()).hexdigest()
+
+    return manifest["hashes"][path]
+
+
+def hash_directory(manifest, directory):
+    """
+    Return one hash covering every file in a directory.
+    """
+    if not os.path.exists(directory):
+        return ""
+
+    file_hashes = []
+
+    for root, _, files in sorted(os.walk(directory)):
+        for file in sorted(files):
+            path = root + "/" + file
+
+            file_hashes.append(path + ":" + hash_file(manifest, path))
+
+    return hash_string("\n".join(file_hashes))
+
+
+def load_manifest(full_rebuild=False, path=MANIFEST_PATH, previous_manifest=None):
+    """
+    Load the manifest written by the previous build.
+
+    The manifest maps every output file to the hashes of the inputs used to render it.
+    If previous_manifest is the manifest of a build made by this process, it is used
+    instead of the file, along with the file hashes and template dependencies it found.
+    """
+    if previous_manifest is not None and not full_rebuild:
+        return {
+            "previous": previous_manifest["outputs"],
+            "outputs": {},
+            "hashes": previous_manifest["hashes"],
+            "globals": {},
+            "templates": previous_manifest["templates"],
+            "collections": {},
+        }
+
+    previous = {}
+
+    if not full_rebuild and os.path.exists(path):
+        with open(path, "r") as file:
+            previous = json.load(file).get("outputs", {})
+
+    return {
+        "previous": previous,
+        "outputs": {},
+        "hashes": {},
+        "globals": {},
+        "templates": {},
+        "collections": {},
+    }
+
+
+def forget_changed_inputs(manifest, changed_paths):
+    """
+    Drop the hashes and template dependencies that involve files changed since a build.
+
+    Used to reuse a manifest for the next build in the same process.
+    """
+    for path in changed_paths:
+        manifest["hashes"].pop(path, None)
+
+    changed_inputs = {":" + path for path in changed_paths}
+
+    includes_changed = any(path.startswith("_includes/") for path in changed_paths)
+
+    for template, inputs in list(manifest["templates"].items()):
+        if includes_changed and "include:_includes" in inputs:
+            del manifest["templates"][template]
+        elif any(name[name.index(":") :] in changed_inputs for name in inputs):
+            del manifest["templates"][template]
+
+    return manifest
+
+
+def set_global_inputs(manifest, site_config):
+    """
+    Hash the inputs that every rendered page depends on.
+    """
+    manifest["globals"] = {
+        "config": hash_file(manifest, "config.yml"),
+        "person_tags": hash_file(manifest, "person_tags.json"),
+    }
+
+    return manifest
+
+
+def include_dependencies(manifest, source):
+    """
+    Return the _includes fragments referenced by a template, including nested includes.
+    """
+    try:
+        referenced = list(
+            meta.find_referenced_templates(
+                template_environment.environment.parse(source)
+            )
+        )
+    except jinja2.TemplateSyntaxError:
+        referenced = [None]
+
+    inputs = {}
+
+    for name in referenced:
+        # an include whose name is only known at render time could be any fragment
+        if name is None or not os.path.isfile(name):
+            inputs["include:_includes"] = hash_directory(manifest, "_includes")
+            continue
+
+        if "include:" + name in inputs:
+            continue
+
+        inputs["include:" + name] = hash_file(manifest, name)
+
+        with open(name, "r") as file:
+            inputs.update(include_dependencies(manifest, file.read()))
+
+    return inputs
+
+
+def template_dependencies(manifest, site_config, path):
+    """
+    Return the layouts and includes used to render a template, following its layout parents.
+    """
+    if path in manifest["templates"]:
+        return manifest["templates"][path]
+
+    if path.startswith("_layouts"):
+        inputs = {
+            "layout:" + path: hash_string(
+                site_config["layouts"][path.split("/")[-1]]
+            )
+        }
+
+        # layouts were parsed when they were registered
+        content = template_environment.layout_loader.layouts[path]
+        metadata = template_environment.layout_loader.metadata[path]
+    else:
+        inputs = {"file:" + path: hash_file(manifest, path)}
+
+        template_front_matter = front_matter_cache.load(path)
+
+        content = template_front_matter.content
+        metadata = template_front_matter.metadata
+
+    inputs.update(include_dependencies(manifest, content))
+
+    if metadata.get("layout"):
+        parent = "_layouts/" + metadata["layout"] + ".html"
+
+        inputs.update(template_dependencies(manifest, site_config, parent))
+
+    manifest["templates"][path] = inputs
+
+    return inputs
+
+
+def collection_digest(manifest, name, entries):
+    """
+    Return a hash of the posts in a collection, in order.
+
+    The hash changes when a post is added to, removed from, or edited in the collection.
+    """
+    if name not in manifest["collections"]:
+        members = []
+
+        for entry in entries:
+            if entry.get("path") and os.path.exists(entry["path"]):
+                members.append(entry["url"] + ":" + hash_file(manifest, entry["path"]))
+            else:
+                members.append(json.dumps(entry, sort_keys=True, default=str))
+
+        manifest["collections"][name] = hash_string("\n".join(members))
+
+    return manifest["collections"][name]
+
+
+def page_inputs(manifest, site_config, path, collections=None, **extra_inputs):
+    """
+    Return the inputs used to render a page.
+
+    path is the source file or layout the page is rendered from. collections maps a
+    name (i.e. "category:Coffee") to the posts the page iterates over.
+    """
+    inputs = {**manifest["globals"], **extra_inputs}
+
+    inputs.update(template_dependencies(manifest, site_config, path))
+
+    for name, entries in (collections or {}).items():
+        inputs["collection:" + name] = collection_digest(manifest, name, entries)
+
+    return inputs
+
+
+def record_output(manifest, output_path, inputs=None):
+    """
+    Record a file written by this build so it is not removed as stale.
+    """
+    manifest["outputs"][output_path] = inputs or {}
+
+
+def needs_rebuild(manifest, output_path, inputs):
+    """
+    Record an output and return True if its inputs changed since the previous build.
+    """
+    record_output(manifest, output_path, inputs)
+
+    if not os.path.exists(output_path):
+        return True
+
+    return manifest["previous"].get(output_path) != inputs
+
+
+def remove_stale_outputs(manifest):
+    """
+    Delete outputs from the previous build that this build did not produce.
+    """
+    removed = 0
+
+    for output_path in manifest["previous"]:
+        if output_path in manifest["outputs"] or not os.path.exists(output_path):
+            continue
+
+        os.remove(output_path)
+
+        removed += 1
+
+        # remove directories left empty, i.e. /2021/01/01/deleted-post/
+        directory = os.path.dirname(output_path)
+
+        while "/" in directory and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+
+            directory = os.path.dirname(directory)
+
+    return removed
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with open(path, "w+") as file:
+        # json.dumps uses the C encoder, which json.dump does not
+        file.write(json.dumps({"outputs": manifest["outputs"]}, sort_keys=True))
+
+
+def save_dependency_graph(manifest, path=DEPENDENCIES_PATH):
+    """
+    Write the page -> inputs graph, and its inverse, as JSON for debugging.
+    """
+    used_by = {}
+
+    for output_path, inputs in manifest["outputs"].items():
+        for name in inputs:
+            used_by.setdefault(name, []).append(output_path)
+
+    graph = {
+        "pages": {
+            output_path: sorted(inputs)
+            for output_path, inputs in manifest["outputs"].items()
+        },
+        "inputs": {name: sorted(outputs) for name, outputs in used_by.items()},
+    }
+
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with open(path, "w+") as file:
+        file.write(json.dumps(graph, sort_keys=True))
@@ -0,0 +1,80 @@
+import gzip
+import os
+
+import build_manifest
+import parallel
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".xml", ".json")
+
+# content codings the server can send, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def available_encodings():
+    if brotli is None:
+        return [("gzip", ".gz")]
+
+    return ENCODINGS
+
+
+def is_up_to_date(path, compressed_path):
+    return (
+        os.path.exists(compressed_path)
+        and os.stat(compressed_path).st_mtime_ns >= os.stat(path).st_mtime_ns
+    )
+
+
+def compress_file(path, site_config):
+    """
+    Write .gz and, if brotli is installed, .br copies of a file next to it.
+
+    Copies newer than the file are kept. Returns the paths of the copies.
+    """
+    content = None
+
+    compressed_paths = []
+
+    for encoding, extension in available_encodings():
+        compressed_path = path + extension
+
+        compressed_paths.append(compressed_path)
+
+        build_manifest.record_output(site_config["manifest"], compressed_path)
+
+        if is_up_to_date(path, compressed_path):
+            continue
+
+        if content is None:
+            with open(path, "rb") as file:
+                content = file.read()
+
+        if encoding == "br":
+            compressed = brotli.compress(content, quality=11)
+        else:
+            # mtime=0 so unchanged pages compress to the same bytes
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+
+        with open(compressed_path, "wb") as file:
+            file.write(compressed)
+
+    return compressed_paths
+
+
+def compress_outputs(site_config):
+    """
+    Precompress every text file written by this build so the server does not compress on each request.
+    """
+    tasks = [
+        {"path": path}
+        for path in sorted(site_config["manifest"]["outputs"])
+        if path.endswith(COMPRESSIBLE_EXTENSIONS) and os.path.exists(path)
+    ]
+
+    compressed = parallel.run_tasks(site_config, compress_file, tasks)
+
+    return sum(len(paths) for paths in compressed)
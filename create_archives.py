@@ -1,34 +1,19 @@
-import concurrent.futures
+import collections
 import datetime
+import json
 import os
 
-import frontmatter
-import jinja2
-
-from app import create_template
-
-
-def list_archive_date(date):
-    if type(date) is str and "." in date:
-        date = date.replace(" ", "T")
-        date = datetime.datetime.strptime(date, "%Y-%m-%dT%H:%M:%S.%f")
-    elif type(date) is str:
-        date = date.replace(" ", "T")
-        date = datetime.datetime.strptime(date, "%Y-%m-%dT%H:%M:%S-00:00")
-
-    return date
-
-
-def long_date(date):
-    return list_archive_date(date).strftime("%B %d, %Y")
-
-
-def date_to_xml_string(date):
-    return list_archive_date(date).strftime("%Y-%m-%dT%H:%M:%S")
-
-
-def archive_date(date):
-    return list_archive_date(date).strftime("%Y/%m")
+import app
+import build_manifest
+import parallel
+import sparklines
+import template_environment
+from template_environment import (
+    archive_date,
+    date_to_xml_string,
+    list_archive_date,
+    long_date,
+)
 
 
 def slugify(post_path):
@@ -41,19 +26,23 @@ def slugify(post_path):
     ).replace(".md", ".html")
 
 
-def save_archive_file(first_page_path, future_path, increment, page_to_save):
+def archive_file_path(first_page_path, future_path, increment):
     if int(increment) > 0:
-        if not os.path.exists(slugify(first_page_path)):
-            os.makedirs(slugify(first_page_path))
+        return slugify(first_page_path + "index.html")
 
-        with open(slugify(first_page_path + "index.html"), "w+") as file:
-            file.write(page_to_save)
-    else:
-        if not os.path.exists(slugify(future_path)):
-            os.makedirs(slugify(future_path))
+    return slugify(future_path) + "index.html"
 
-        with open(slugify(future_path) + "index.html", "w+") as file:
-            file.write(page_to_save)
+
+def save_archive_file(first_page_path, future_path, increment, page_to_save):
+    path_to_save = archive_file_path(first_page_path, future_path, increment)
+
+    if not os.path.exists(os.path.dirname(path_to_save)):
+        os.makedirs(os.path.dirname(path_to_save))
+
+    with open(path_to_save, "w+") as file:
+        file.write(page_to_save)
+
+    return path_to_save
 
 
 def generate_archive_page(
@@ -90,31 +79,66 @@ def generate_archive_page(
         "url": output + date + "/" + str(increment + 1) + "/",
     }
 
-    rendered_string = create_template(
+    first_page_path = output + "/" + date + "/"
+
+    if increment > 0:
+        first_page_path += str(increment + 1) + "/"
+
+    # each page only depends on the posts it lists and on how many pages there are
+    inputs = build_manifest.page_inputs(
+        site_config["manifest"],
+        site_config,
+        template_path,
+        collections={f"date:{date}:{increment}": posts},
+        pages=str(number_of_pages),
+    )
+
+    if not build_manifest.needs_rebuild(
+        site_config["manifest"],
+        archive_file_path(first_page_path, output + "/" + date + "/", increment + 1),
+        inputs,
+    ):
+        return pages_created_count
+
+    rendered_string = app.create_template(
         template_path, site=site_config, category=date, page=page, paginator=paginator
     )
 
     print(f"Generating Archive Page {date} ({increment})")
 
-    increment = str(increment + 1)
+    save_archive_file(
+        first_page_path,
+        output + "/" + date + "/",
+        increment + 1,
+        rendered_string,
+    )
 
-    if increment == "1":
-        save_archive_file(
-            output + "/" + date + "/",
-            output + "/" + date + "/",
-            increment,
-            rendered_string,
-        )
-    else:
-        save_archive_file(
-            output + "/" + date + "/" + increment + "/",
-            output + "/" + date + "/",
+    pages_created_count += 1
+
+    return pages_created_count
+
+
+def generate_date_archive_pages(date, entries, output, site_config):
+    """
+    Generates every page of one day, month, or year archive.
+    """
+    number_of_pages = int(len(entries) / 10) + 1
+
+    pages_created_count = 0
+
+    for increment in range(0, number_of_pages):
+        pages_created_count = generate_archive_page(
             increment,
-            rendered_string,
+            pages_created_count,
+            "_layouts/date_archive.html",
+            entries,
+            number_of_pages,
+            date,
+            site_config,
+            output,
+            date + "/",
         )
 
-    pages_created_count += 1
-
     return pages_created_count
 
 
@@ -127,156 +151,163 @@ def create_category_pages(
 
     if page_type == "category":
         iterator = site_config["categories"].items()
-        layout = "category.html"
     else:
         iterator = site_config["tags"].items()
-        layout = "tag.html"
-
-    for category, entries in iterator:
-        front_matter = frontmatter.loads(site_config["layouts"][layout])
-
-        template_name = front_matter["layout"]
-
-        number_of_pages = int(len(entries) / 10) + 1
 
-        slug = (
-            category.lower()
-            .replace(" ", "-")
-            .replace("(", "")
-            .replace(")", "")
-            .replace("'", "")
-        )
+    tasks = [
+        {
+            "category": category,
+            "entries": entries,
+            "output": output,
+            "page_type": page_type,
+        }
+        for category, entries in iterator
+    ]
 
-        for increment in range(0, number_of_pages):
-            paginator = {
-                "total_pages": number_of_pages,
-                "previous_page": increment - 1,
-                "next_page": increment + 1,
-                "previous_page_path": f"/{page_type}/"
-                + slug
-                + "/"
-                + str(increment - 1)
-                + "/",
-                "next_page_path": f"/{page_type}/"
-                + slug
-                + "/"
-                + str(increment + 1)
-                + "/",
-                "current_page": increment + 1
-            }
+    pages_created_count += sum(
+        parallel.run_tasks(site_config, create_category_page_set, tasks)
+    )
 
-            if increment - 1 <= 0:
-                paginator["previous_page_path"] = f"/{page_type}/" + slug + "/2/"
-            else:
-                paginator["previous_page_path"] = (
-                    f"/{page_type}/" + slug + "/" + str(increment - 1) + "/"
-                )
+    return site_config, pages_created_count
 
-            if increment + 1 == number_of_pages:
-                paginator["next_page_path"] = ""
-                paginator["next_page"] = 0
-            else:
-                paginator["next_page_path"] = (
-                    "/category/" + slug + "/" + str(increment + 1) + "/"
-                )
 
-            template_string = site_config["layouts"][template_name + ".html"]
+def create_category_page_set(category, entries, output, page_type, site_config):
+    """
+    Creates every page of one category or tag.
+    """
+    if page_type == "category":
+        layout = "category.html"
+    else:
+        layout = "tag.html"
 
-            loader = jinja2.FileSystemLoader(searchpath="./")
+    pages_created_count = 0
 
-            page = {
-                "title": category,
-                "category": category,
-                "posts": entries[increment * 10 : increment * 10 + 10],
-                "url": f"/{page_type}/" + slug + "/" + str(increment) + "/",
-                "number": increment,
-            }
+    layout_metadata, layout_template = template_environment.get_layout(layout)
 
-            dates = {}
+    template_name = layout_metadata["layout"]
 
-            for i in range(0, 365):
-                dates[
-                    (datetime.datetime.now() - datetime.timedelta(days=i)).strftime(
-                        "%Y-%m-%d"
-                    )
-                ] = 0
+    _, main_template = template_environment.get_layout(template_name + ".html")
 
-            for post in entries:
-                if post["full_date"] != "":
-                    date = datetime.datetime.strptime(
-                        post["full_date"], "%Y-%m-%d %H:%M:%S-00:00"
-                    ).strftime("%Y-%m-%d")
-                else:
-                    date = ""
+    number_of_pages = int(len(entries) / 10) + 1
 
-                if dates.get(date) is not None:
-                    dates[date] += 1
+    # the sparkline is the same on every page of the category
+    data_points = sparklines.daily_counts(
+        [sparklines.post_day(post) for post in entries], 365
+    )
 
-            values = dates.values()
+    number_of_posts = len(entries)
 
-            # convert values to list
-            data_points = list(values)
+    sparkline = f"""<p>There are {number_of_posts} Posts in this {page_type}<br><embed src="/assets/sparkline.svg?{','.join([str(val) for val in data_points])}" height=45></p>"""
 
-            data_points.reverse()
+    slug = (
+        category.lower()
+        .replace(" ", "-")
+        .replace("(", "")
+        .replace(")", "")
+        .replace("'", "")
+    )
 
-            number_of_posts = len(entries)
+    for increment in range(0, number_of_pages):
+        paginator = {
+            "total_pages": number_of_pages,
+            "previous_page": increment - 1,
+            "next_page": increment + 1,
+            "previous_page_path": f"/{page_type}/"
+            + slug
+            + "/"
+            + str(increment - 1)
+            + "/",
+            "next_page_path": f"/{page_type}/"
+            + slug
+            + "/"
+            + str(increment + 1)
+            + "/",
+            "current_page": increment + 1
+        }
+
+        if increment - 1 <= 0:
+            paginator["previous_page_path"] = f"/{page_type}/" + slug + "/2/"
+        else:
+            paginator["previous_page_path"] = (
+                f"/{page_type}/" + slug + "/" + str(increment - 1) + "/"
+            )
 
-            sparkline = f"""<p>There are {number_of_posts} Posts in this {page_type}<br><embed src="/assets/sparkline.svg?{','.join([str(val) for val in data_points])}" height=45></p>"""
+        if increment + 1 == number_of_pages:
+            paginator["next_page_path"] = ""
+            paginator["next_page"] = 0
+        else:
+            paginator["next_page_path"] = (
+                "/category/" + slug + "/" + str(increment + 1) + "/"
+            )
 
-            page["sparkline"] = sparkline
+        path_to_save = archive_file_path(
+            output + f"/{page_type}/" + slug + "/" + str(increment) + "/",
+            output + f"/{page_type}/" + slug + "/",
+            increment,
+        )
 
-            rendered_front_matter = jinja2.Environment(loader=loader)
+        inputs = build_manifest.page_inputs(
+            site_config["manifest"],
+            site_config,
+            "_layouts/" + layout,
+            collections={
+                f"{page_type}:{category}:{increment}": entries[
+                    increment * 10 : increment * 10 + 10
+                ]
+            },
+            pages=str(number_of_pages),
+            sparkline=build_manifest.hash_string(sparkline),
+        )
 
-            # register filter
-            rendered_front_matter.filters["long_date"] = long_date
-            rendered_front_matter.filters["date_to_xml_string"] = date_to_xml_string
-            rendered_front_matter.filters["archive_date"] = archive_date
-            rendered_front_matter.filters["list_archive_date"] = list_archive_date
+        if not build_manifest.needs_rebuild(
+            site_config["manifest"], path_to_save, inputs
+        ):
+            continue
 
-            rendered_front_matter = rendered_front_matter.from_string(
-                front_matter.content
-            ).render(
-                site=site_config, category=category, page=page, paginator=paginator
-            )
+        page = {
+            "title": category,
+            "category": category,
+            "posts": entries[increment * 10 : increment * 10 + 10],
+            "url": f"/{page_type}/" + slug + "/" + str(increment) + "/",
+            "number": increment,
+        }
 
-            main_page_content = jinja2.Environment(loader=loader)
+        page["sparkline"] = sparkline
 
-            # register filter
-            main_page_content.filters["long_date"] = long_date
-            main_page_content.filters["date_to_xml_string"] = date_to_xml_string
-            main_page_content.filters["archive_date"] = archive_date
-            main_page_content.filters["list_archive_date"] = list_archive_date
+        rendered_front_matter = layout_template.render(
+            site=site_config, category=category, page=page, paginator=paginator
+        )
 
-            main_page_content = main_page_content.from_string(template_string).render(
-                page=page,
-                category=category,
-                site=site_config,
-                content=rendered_front_matter,
-                paginator=paginator,
-            )
+        main_page_content = main_template.render(
+            page=page,
+            category=category,
+            site=site_config,
+            content=rendered_front_matter,
+            paginator=paginator,
+        )
 
-            print(f"Generating {category} {page_type} Page")
+        print(f"Generating {category} {page_type} Page")
 
-            increment = str(increment)
+        increment = str(increment)
 
-            slug = (
-                category.lower()
-                .replace(" ", "-")
-                .replace("(", "")
-                .replace(")", "")
-                .replace("'", "")
-            )
+        slug = (
+            category.lower()
+            .replace(" ", "-")
+            .replace("(", "")
+            .replace(")", "")
+            .replace("'", "")
+        )
 
-            save_archive_file(
-                output + f"/{page_type}/" + slug + "/" + increment + "/",
-                output + f"/{page_type}/" + slug + "/",
-                increment,
-                main_page_content,
-            )
+        save_archive_file(
+            output + f"/{page_type}/" + slug + "/" + increment + "/",
+            output + f"/{page_type}/" + slug + "/",
+            increment,
+            main_page_content,
+        )
 
-            pages_created_count += 1
+        pages_created_count += 1
 
-    return site_config, pages_created_count
+    return pages_created_count
 
 
 def create_list_pages(base_dir, site_config, output, pages_created_count):
@@ -298,7 +329,7 @@ def create_list_pages(base_dir, site_config, output, pages_created_count):
         number_of_pages = int(len(site_config[page]) / 10) + 1
 
         # reverse so posts are in reverse chronological order
-        site_config[page].reverse()
+        entries = site_config[page][::-1]
 
         for increment in range(0, number_of_pages):
             paginator = {
@@ -317,9 +348,28 @@ def create_list_pages(base_dir, site_config, output, pages_created_count):
                     "/" + page + "/" + str(increment - 1) + "/"
                 )
 
-            posts = site_config[page][increment * 10 : increment * 10 + 10]
+            posts = entries[increment * 10 : increment * 10 + 10]
 
-            template = create_template(
+            path_to_save = archive_file_path(
+                output + "/" + page + "/" + str(increment) + "/",
+                output + "/" + page + "/",
+                increment,
+            )
+
+            inputs = build_manifest.page_inputs(
+                site_config["manifest"],
+                site_config,
+                base_dir + "/templates/" + page + ".html",
+                collections={f"list:{page}:{increment}": posts},
+                pages=str(number_of_pages),
+            )
+
+            if not build_manifest.needs_rebuild(
+                site_config["manifest"], path_to_save, inputs
+            ):
+                continue
+
+            template = app.create_template(
                 base_dir + "/templates/" + page + ".html",
                 page={"posts": posts, "title": page.title(), "url": "/" + page + "/"},
                 site=site_config,
@@ -342,11 +392,13 @@ def create_list_pages(base_dir, site_config, output, pages_created_count):
     return site_config, pages_created_count
 
 
-def create_date_archive_pages(site_config, output, pages_created_count, posts):
+def group_posts_by_date(posts):
     """
-    Creates pages that lists posts by the day, month and year in which they were published.
+    Groups posts by the day, month and year in which they were published.
+
+    Keys are formatted as YYYY-MM-DD, YYYY-MM and YYYY.
     """
-    all_posts = {}
+    all_posts = collections.defaultdict(list)
 
     for post in posts:
         date = post["url"].split("/")
@@ -361,60 +413,35 @@ def create_date_archive_pages(site_config, output, pages_created_count, posts):
         if not year.isdigit() or not month.isdigit():
             continue
 
-        date = f"{year}/{month}-{day}"
+        all_posts[f"{year}-{month}-{day}"].append(post)
+        all_posts[f"{year}-{month}"].append(post)
+        all_posts[year].append(post)
 
-        if all_posts.get(f"{year}-{month}-{day}") is None:
-            all_posts[f"{year}-{month}-{day}"] = [post]
-        else:
-            all_posts[f"{year}-{month}-{day}"] = all_posts[f"{year}-{month}-{day}"] + [
-                post
-            ]
+    return all_posts
 
-        if all_posts.get(f"{year}-{month}") is None:
-            all_posts[f"{year}-{month}"] = [post]
-        else:
-            all_posts[f"{year}-{month}"] = all_posts[f"{year}-{month}"] + [post]
 
-        if all_posts.get(year) is None:
-            all_posts[year] = [post]
-        else:
-            all_posts[year] = all_posts[year] + [post]
+def create_date_archive_pages(site_config, output, pages_created_count, posts):
+    """
+    Creates pages that lists posts by the day, month and year in which they were published.
+    """
+    all_posts = group_posts_by_date(posts)
 
     archive_object = {"years": {}}
 
     year_month_combinations = {}
 
     # generate posts by date archive pages
-    for date, entries in all_posts.items():
-        entry_count = len(entries)
-        number_of_pages = int(entry_count / 10) + 1
-
-        original_date = date
-
-        date = date.replace("-", "/")
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=15) as executor:
-            future_to_page = [
-                executor.submit(
-                    generate_archive_page,
-                    increment,
-                    pages_created_count,
-                    "_layouts/date_archive.html",
-                    entries,
-                    number_of_pages,
-                    date,
-                    site_config,
-                    output,
-                    date + "/",
-                )
-                for increment in range(0, number_of_pages)
-            ]
+    tasks = [
+        {"date": date.replace("-", "/"), "entries": entries, "output": output}
+        for date, entries in all_posts.items()
+    ]
 
-            for _ in concurrent.futures.as_completed(future_to_page):
-                try:
-                    pages_created_count += 1
-                except Exception as exc:
-                    print(f"{date} generated an exception: {exc}")
+    pages_created_count += sum(
+        parallel.run_tasks(site_config, generate_date_archive_pages, tasks)
+    )
+
+    for original_date in all_posts:
+        date = original_date.replace("-", "/")
 
         if len(original_date) > 4:
             month = original_date.split("-")[1]
@@ -427,28 +454,34 @@ def create_date_archive_pages(site_config, output, pages_created_count, posts):
             if year_month_combinations.get(year + "-" + month) is None:
                 year_month_combinations[year + "-" + month] = [date]
 
-                if archive_object["years"].get(year) is None:
-                    archive_object["years"][year] = [month_object]
-                else:
-                    archive_object["years"][year] = archive_object["years"][year] + [
-                        month_object
-                    ]
+                archive_object["years"].setdefault(year, []).append(month_object)
 
     print("Generating Archive Page at /archive/")
 
+    archive_path = slugify(output + "/archive" + "/index.html")
+
     if os.path.exists("templates/archive.html"):
-        rendered_string = create_template(
+        inputs = build_manifest.page_inputs(
+            site_config["manifest"],
+            site_config,
             "templates/archive.html",
-            site=site_config,
-            page={"years": archive_object["years"], "url": "/archive/"},
-            paginator=None,
+            years=build_manifest.hash_string(json.dumps(archive_object, sort_keys=True)),
+            categories=build_manifest.hash_string("\n".join(site_config["categories"])),
         )
 
-        if not os.path.exists(output + "/archive"):
-            os.makedirs(output + "/archive")
+        if build_manifest.needs_rebuild(site_config["manifest"], archive_path, inputs):
+            rendered_string = app.create_template(
+                "templates/archive.html",
+                site=site_config,
+                page={"years": archive_object["years"], "url": "/archive/"},
+                paginator=None,
+            )
 
-        with open(slugify(output + "/archive" + "/index.html"), "w+") as file:
-            file.write(rendered_string)
+            if not os.path.exists(output + "/archive"):
+                os.makedirs(output + "/archive")
+
+            with open(archive_path, "w+") as file:
+                file.write(rendered_string)
 
     return site_config, pages_created_count
 
@@ -459,7 +492,7 @@ def generate_sitemap(site_config, output):
     """
     lastmod = datetime.datetime.now().strftime("%Y-%m-%d")
 
-    sitemap = create_template(
+    sitemap = app.create_template(
         "templates/sitemap.xml",
         base_url=site_config["baseurl"],
         pages=site_config["pages"],
@@ -468,3 +501,5 @@ def generate_sitemap(site_config, output):
 
     with open(slugify(output + "/sitemap.xml"), "w+") as file:
         file.write(sitemap)
+
+    build_manifest.record_output(site_config["manifest"], slugify(output + "/sitemap.xml"))
@@ -0,0 +1,61 @@
+import copy
+import os
+import pickle
+
+import frontmatter
+
+CACHE_PATH = ".letsjam/front_matter.pickle"
+
+# path -> ((mtime, size), metadata, content)
+cache = {}
+
+# paths loaded during this build, so deleted files are not saved again
+used_paths = set()
+
+
+def load(path):
+    """
+    Return the front matter and content of a file, parsing the file at most once while it is unchanged.
+
+    Each call returns a new frontmatter.Post, so callers can change it.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    entry = cache.get(path)
+
+    if entry is None or entry[0] != key:
+        front_matter = frontmatter.load(path)
+
+        entry = (key, front_matter.metadata, front_matter.content)
+
+        cache[path] = entry
+
+    used_paths.add(path)
+
+    post = frontmatter.Post(entry[2])
+    post.metadata = copy.deepcopy(entry[1])
+
+    return post
+
+
+def load_cache(path=CACHE_PATH):
+    """
+    Read the front matter parsed by previous builds.
+    """
+    if not os.path.exists(path):
+        return
+
+    try:
+        with open(path, "rb") as file:
+            cache.update(pickle.load(file))
+    except (pickle.UnpicklingError, EOFError):
+        print("Ignoring unreadable front matter cache " + path)
+
+
+def save_cache(path=CACHE_PATH):
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with open(path, "wb") as file:
+        pickle.dump({path: cache[path] for path in used_paths}, file)
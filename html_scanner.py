@@ -0,0 +1,195 @@
+import html.parser
+
+# tags that are written as <tag/> and never have children
+VOID_TAGS = (
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+)
+
+# tags whose start closes an open paragraph
+CLOSES_PARAGRAPH = (
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "details",
+    "div",
+    "dl",
+    "fieldset",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hr",
+    "main",
+    "menu",
+    "nav",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "ul",
+)
+
+RAW_TEXT_TAGS = ("script", "style")
+
+
+def escape_text(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def format_attribute(name, value):
+    if value is None:
+        value = ""
+
+    value = escape_text(value)
+
+    # quote the same way BeautifulSoup does
+    if '"' in value and "'" not in value:
+        return f" {name}='{value}'"
+
+    return f' {name}="{value.replace(chr(34), "&quot;")}"'
+
+
+class ExcerptScanner(html.parser.HTMLParser):
+    """
+    Finds the first paragraph and the images in an HTML document without building a tree.
+    """
+
+    def __init__(self, find_images=True):
+        super().__init__(convert_charrefs=True)
+
+        self.find_images = find_images
+
+        self.paragraph_html = []
+        self.paragraph_text = []
+        self.images = []
+
+        # tags open inside the first paragraph, outermost first
+        self.open_tags = []
+        self.in_paragraph = False
+        self.paragraph_done = False
+
+    @property
+    def done(self):
+        return self.paragraph_done and not self.find_images
+
+    def start_tag_html(self, tag, attrs):
+        # BeautifulSoup writes attributes in alphabetical order
+        attributes = "".join(
+            format_attribute(name, value) for name, value in sorted(dict(attrs).items())
+        )
+
+        if tag in VOID_TAGS:
+            return f"<{tag}{attributes}/>"
+
+        return f"<{tag}{attributes}>"
+
+    def close_paragraph(self):
+        for tag in reversed(self.open_tags):
+            self.paragraph_html.append(f"</{tag}>")
+
+        self.open_tags = []
+        self.in_paragraph = False
+        self.paragraph_done = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "img" and self.find_images:
+            self.images.append(dict(attrs))
+
+        if self.in_paragraph and tag in CLOSES_PARAGRAPH:
+            self.close_paragraph()
+
+        if self.in_paragraph:
+            self.paragraph_html.append(self.start_tag_html(tag, attrs))
+
+            if tag not in VOID_TAGS:
+                self.open_tags.append(tag)
+        elif tag == "p" and not self.paragraph_done:
+            self.in_paragraph = True
+            self.open_tags = ["p"]
+            self.paragraph_html.append(self.start_tag_html(tag, attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+        if self.in_paragraph and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not self.in_paragraph or tag not in self.open_tags:
+            return
+
+        # close any tags left open inside the one that is ending
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+
+            self.paragraph_html.append(f"</{open_tag}>")
+
+            if open_tag == tag:
+                break
+
+        if not self.open_tags:
+            self.in_paragraph = False
+            self.paragraph_done = True
+
+    def handle_data(self, data):
+        if not self.in_paragraph:
+            return
+
+        self.paragraph_text.append(data)
+
+        if self.open_tags[-1] in RAW_TEXT_TAGS:
+            self.paragraph_html.append(data)
+        else:
+            self.paragraph_html.append(escape_text(data))
+
+    def handle_comment(self, data):
+        if self.in_paragraph:
+            self.paragraph_html.append(f"<!--{data}-->")
+
+
+def scan(document, find_images=True, chunk_size=4096):
+    """
+    Return the HTML and text of the first <p> in a document, and the attributes of its <img> tags.
+
+    Scanning stops after the first paragraph unless find_images is True.
+    """
+    scanner = ExcerptScanner(find_images)
+
+    for start in range(0, len(document), chunk_size):
+        scanner.feed(document[start : start + chunk_size])
+
+        if scanner.done:
+            break
+    else:
+        scanner.close()
+
+    if scanner.in_paragraph:
+        scanner.close_paragraph()
+
+    return (
+        "".join(scanner.paragraph_html),
+        "".join(scanner.paragraph_text),
+        scanner.images,
+    )
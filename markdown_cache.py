@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+
+import markdown
+
+CACHE_DIR = ".letsjam/markdown"
+
+# least recently used entries are removed once the cache is larger than this
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+
+# extensions passed to markdown.markdown; part of every cache key
+EXTENSIONS = []
+
+# key -> html for entries used by this process
+memory_cache = {}
+
+
+def cache_key(text):
+    configuration = json.dumps(
+        {"markdown": markdown.__version__, "extensions": EXTENSIONS}, sort_keys=True
+    )
+
+    return hashlib.sha256((configuration + "\0" + text).encode("utf-8")).hexdigest()
+
+
+def convert(text):
+    """
+    Convert Markdown to HTML, reusing the HTML from any previous build of the same text.
+    """
+    key = cache_key(text)
+
+    if key in memory_cache:
+        return memory_cache[key]
+
+    path = CACHE_DIR + "/" + key[:2] + "/" + key + ".html"
+
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            html = file.read()
+
+        # mark the entry as recently used
+        os.utime(path)
+    else:
+        html = markdown.markdown(text, extensions=EXTENSIONS)
+
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # write to a temporary file first so other processes never read a partial entry
+        temporary_path = path + "." + str(os.getpid())
+
+        with open(temporary_path, "w+") as file:
+            file.write(html)
+
+        os.replace(temporary_path, path)
+
+    memory_cache[key] = html
+
+    return html
+
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """
+    Remove the least recently used entries until the cache is no larger than max_bytes.
+    """
+    if not os.path.exists(CACHE_DIR):
+        return 0
+
+    entries = []
+
+    for root, _, files in os.walk(CACHE_DIR):
+        for file in files:
+            stat = os.stat(root + "/" + file)
+
+            entries.append((stat.st_mtime, stat.st_size, root + "/" + file))
+
+    total_bytes = sum(size for _, size, _ in entries)
+
+    removed = 0
+
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+
+        os.remove(path)
+
+        total_bytes -= size
+        removed += 1
+
+    return removed
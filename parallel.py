@@ -0,0 +1,58 @@
+import concurrent.futures
+import functools
+
+import template_environment
+
+# the read-only copy of site_config held by each worker process
+worker_site_config = {}
+
+
+def start_worker(site_config):
+    global worker_site_config
+
+    worker_site_config = site_config
+
+    # layouts are registered again in case the worker did not inherit them from the parent
+    template_environment.register_layouts(site_config["layouts"])
+
+
+def call_with_site(function, task):
+    """
+    Run a task against the worker's copy of site_config.
+
+    Returns the result and the outputs the task recorded in the build manifest.
+    """
+    worker_site_config["manifest"]["outputs"] = {}
+
+    result = function(site_config=worker_site_config, **task)
+
+    return result, worker_site_config["manifest"]["outputs"]
+
+
+def run_tasks(site_config, function, tasks):
+    """
+    Call function(site_config=site_config, **task) for every task and return the results in order.
+
+    If site_config["jobs"] is more than 1, tasks run in a pool of processes that each
+    hold a read-only copy of site_config, so function must not change site_config.
+    """
+    jobs = site_config.get("jobs", 1)
+
+    if jobs <= 1 or len(tasks) <= 1:
+        return [function(site_config=site_config, **task) for task in tasks]
+
+    results = []
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, initializer=start_worker, initargs=(site_config,)
+    ) as executor:
+        for result, outputs in executor.map(
+            functools.partial(call_with_site, function),
+            tasks,
+            chunksize=max(1, len(tasks) // (jobs * 4)),
+        ):
+            site_config["manifest"]["outputs"].update(outputs)
+
+            results.append(result)
+
+    return results
@@ -0,0 +1,74 @@
+import collections
+import threading
+
+
+class ResponseCache:
+    """
+    Keeps the most recently used response bodies in memory, up to max_bytes in total.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+
+        # files bigger than this would push most other entries out
+        self.max_entry_bytes = max_bytes // 8
+
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+
+                return None
+
+            self.entries.move_to_end(key)
+
+            self.hits += 1
+
+            return entry[0]
+
+    def put(self, key, value, size):
+        if size > self.max_entry_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+
+            self.entries[key] = (value, size)
+            self.size += size
+
+            # least recently used entries are first
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
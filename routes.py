@@ -0,0 +1,111 @@
+import json
+import mimetypes
+import os
+
+ROUTES_PATH = ".letsjam/routes.json"
+
+# precompressed copies written by compress.py, by content coding
+COMPRESSED_EXTENSIONS = {".br": "br", ".gz": "gzip"}
+
+
+def file_entry(path):
+    stat = os.stat(path)
+
+    return {
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "etag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+    }
+
+
+def route_table(output_paths, output="_site"):
+    """
+    Map every URL the site answers to the file it is served from.
+
+    /about/ and /about are served from about.html if it exists, and /2023/01/01/slug/
+    from 2023/01/01/slug/index.html. /2023/01/01/slug redirects to /2023/01/01/slug/.
+    """
+    # some pages are recorded as _site/./page.html/index.html
+    files = set(os.path.normpath(path) for path in output_paths if os.path.isfile(path))
+
+    # lower numbers win when two files could serve the same url
+    candidates = {}
+
+    for path in files:
+        extension = os.path.splitext(path)[1]
+
+        if extension in COMPRESSED_EXTENSIONS and path[: -len(extension)] in files:
+            continue
+
+        url = path[len(output) :]
+
+        urls = [(url, 0)]
+
+        if url.endswith("/index.html"):
+            directory = url[: -len("index.html")]
+
+            urls.append((directory, 2))
+
+            if directory != "/":
+                urls.append((directory.rstrip("/"), 3))
+        elif url.endswith(".html"):
+            urls.append((url[: -len(".html")], 1))
+            urls.append((url[: -len(".html")] + "/", 1))
+
+        for route, priority in urls:
+            if route not in candidates or candidates[route][0] > priority:
+                candidates[route] = (priority, path)
+
+    table = {}
+
+    for route, (priority, path) in candidates.items():
+        if priority == 3:
+            table[route] = {"redirect": route + "/"}
+            continue
+
+        entry = file_entry(path)
+
+        entry["content_type"] = (
+            mimetypes.guess_type(path)[0] or "application/octet-stream"
+        )
+
+        entry["encodings"] = {
+            encoding: file_entry(path + extension)
+            for extension, encoding in COMPRESSED_EXTENSIONS.items()
+            if path + extension in files
+        }
+
+        table[route] = entry
+
+    return table
+
+
+def save_routes(manifest, output="_site", path=ROUTES_PATH):
+    """
+    Write the route table for the files recorded in the build manifest.
+
+    The table is written to a temporary file first, so a server never reads half of it.
+    """
+    table = route_table(manifest["outputs"], output)
+
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with open(path + ".tmp", "w") as file:
+        file.write(json.dumps(table))
+
+    os.replace(path + ".tmp", path)
+
+    return table
+
+
+def load_routes(path=ROUTES_PATH):
+    """
+    Return the route table written by the last build, or None if there is none.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as file:
+        return json.load(file)
@@ -1,24 +1,387 @@
-from flask import Flask, send_from_directory
+import argparse
+import mimetypes
+import os
+import re
+import threading
+import time
+
+from flask import Flask, Response, abort, jsonify, redirect, request, send_file
+
+import response_cache
+import routes
 
 app = Flask(__name__, template_folder="_site")
 
+SITE_DIR = "_site"
+
+# content codings written by the build with --precompress, in order of preference
+ENCODINGS = ["br", "gzip"]
+
+# files whose name contains a content hash, i.e. main.3f9a1c2b.css, never change
+FINGERPRINTED_FILE = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# other files can change on the next build, so browsers check their ETag first
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# url -> file, written by the build to .letsjam/routes.json
+route_table = None
+route_table_mtime = None
+route_table_checked_at = 0
+
+# how often, in seconds, to check whether a build wrote a new route table
+ROUTE_TABLE_CHECK_INTERVAL = 1
+
+# response bodies kept in memory, set by --cache-size
+cache = None
+
+# number of builds finished by the watcher, so browsers can tell when to reload
+build_number = 0
+build_finished = threading.Condition()
+
+# added to every HTML page while the server is watching for changes
+LIVE_RELOAD_SCRIPT = """<script>
+new EventSource("/_livereload").onmessage = function () { location.reload(); };
+</script>"""
+
+watching = False
+
+
+def resolve_path(path):
+    """
+    Return the file in _site that a URL path refers to, or None.
+
+    /about/ is served from about.html if it exists, and /2023/01/01/slug/ from
+    2023/01/01/slug/index.html.
+    """
+    parts = [part for part in path.split("/") if part]
+
+    # never serve files outside _site
+    if any(part in (".", "..") for part in parts):
+        return None
+
+    file_path = os.path.join(SITE_DIR, *parts)
+
+    for candidate in (file_path, file_path + ".html", file_path + "/index.html"):
+        if os.path.isfile(candidate):
+            return candidate
+
+    return None
+
+
+def filesystem_route(path):
+    """
+    Find the file for a URL on disk, for sites built without a route table.
+    """
+    file_path = resolve_path(path)
+
+    if file_path is None:
+        return None
+
+    # /slug should be /slug/ so that relative links in the page resolve
+    if file_path.endswith("/index.html") and path and not path.endswith("/"):
+        return {"redirect": "/" + path + "/"}
+
+    route = routes.file_entry(file_path)
+
+    route["content_type"] = (
+        mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    )
+
+    route["encodings"] = {
+        encoding: routes.file_entry(file_path + extension)
+        for extension, encoding in routes.COMPRESSED_EXTENSIONS.items()
+        if os.path.isfile(file_path + extension)
+    }
+
+    return route
+
+
+def current_route_table():
+    """
+    Return the route table of the last build, loading it again when a build replaces it.
+    """
+    global route_table, route_table_mtime, route_table_checked_at
+
+    now = time.monotonic()
+
+    if now - route_table_checked_at < ROUTE_TABLE_CHECK_INTERVAL:
+        return route_table
+
+    route_table_checked_at = now
+
+    try:
+        mtime = os.stat(routes.ROUTES_PATH).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    if mtime != route_table_mtime:
+        # replace the whole table at once so requests never see half of a build
+        route_table = routes.load_routes()
+        route_table_mtime = mtime
+
+        # a new table means a new build, so cached files may have changed
+        if cache is not None:
+            cache.clear()
+
+    return route_table
+
+
+def find_route(path):
+    table = current_route_table()
+
+    if table is None:
+        return filesystem_route(path)
+
+    return table.get("/" + path)
+
+
+def accepted_encodings(header):
+    """
+    Return the content codings allowed by an Accept-Encoding header.
+    """
+    encodings = set()
+
+    for item in header.split(","):
+        name, _, parameters = item.partition(";")
+
+        try:
+            quality = float(parameters.replace(" ", "").removeprefix("q=") or 1)
+        except ValueError:
+            quality = 1
+
+        # i.e. "gzip;q=0" means gzip must not be used
+        if quality == 0:
+            continue
+
+        encodings.add(name.strip().lower())
+
+    return encodings
+
+
+def send_site_file(path):
+    """
+    Send a file from _site, or a precompressed copy of it if the client accepts one.
+    """
+    route = find_route(path)
+
+    if route is None:
+        abort(404)
+
+    if "redirect" in route:
+        return redirect(route["redirect"], code=301)
+
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+
+    encoding = None
+    variant = route
+
+    for name in ENCODINGS:
+        if name in accepted and name in route["encodings"]:
+            encoding = name
+            variant = route["encodings"][name]
+            break
+
+    if cache is not None and variant["size"] <= cache.max_entry_bytes:
+        return cached_response(route, variant, encoding)
+
+    # each encoding is a separate file, so each gets its own strong ETag
+    response = send_file(
+        os.path.abspath(variant["path"]),
+        mimetype=route["content_type"],
+        conditional=True,
+        etag=variant["etag"],
+        last_modified=variant["mtime"],
+    )
 
+    return add_cache_headers(response, route, encoding)
+
+
+def cached_response(route, variant, encoding):
+    """
+    Answer a request from the response cache, reading the file into the cache on a miss.
+    """
+    key = (variant["path"], variant["etag"])
+
+    entry = cache.get(key)
+
+    if entry is None:
+        with open(variant["path"], "rb") as file:
+            body = file.read()
+
+        response = Response(body, mimetype=route["content_type"])
+        response.set_etag(variant["etag"])
+        response.last_modified = variant["mtime"]
+
+        add_cache_headers(response, route, encoding)
+
+        entry = (body, list(response.headers.items()))
+
+        cache.put(key, entry, len(body))
+
+    body, headers = entry
+
+    return Response(body, headers=headers).make_conditional(
+        request, accept_ranges=True, complete_length=len(body)
+    )
+
+
+def add_cache_headers(response, route, encoding):
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+
+    if route["encodings"]:
+        response.vary.add("Accept-Encoding")
+
+    response.headers["Cache-Control"] = cache_control(route)
+
+    return response
+
+
+def cache_control(route):
+    if FINGERPRINTED_FILE.search(route["path"]):
+        return IMMUTABLE_CACHE_CONTROL
+
+    return REVALIDATE_CACHE_CONTROL
+
+
+@app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
 def index(path):
-    path = path.rstrip("/") + ".html"
-
-    return send_from_directory("_site", path)
+    return send_site_file(path)
 
 
 @app.route("/assets/<path:path>")
 def render_assets(path):
-    return send_from_directory("_site/assets", path)
+    return send_site_file("assets/" + path)
 
 
 @app.route("/assets/styles/<path:path>")
 def render_styles(path):
-    return send_from_directory("_site/assets/styles", path)
+    return send_site_file("assets/styles/" + path)
+
+
+@app.route("/_stats")
+def stats():
+    """
+    Report how often the response cache answered a request.
+    """
+    if cache is None:
+        return jsonify({"enabled": False})
+
+    return jsonify({"enabled": True, **cache.stats()})
+
+
+@app.route("/_livereload")
+def live_reload():
+    """
+    Send an event to the browser every time the site is rebuilt.
+    """
+
+    def events(last_build):
+        while True:
+            with build_finished:
+                build_finished.wait_for(lambda: build_number != last_build, timeout=15)
+
+                current_build = build_number
+
+            if current_build == last_build:
+                # keep idle connections open
+                yield ": ping\n\n"
+            else:
+                last_build = current_build
+
+                yield f"data: {current_build}\n\n"
+
+    return Response(events(build_number), mimetype="text/event-stream")
+
+
+@app.after_request
+def add_live_reload_script(response):
+    if (
+        not watching
+        or response.mimetype != "text/html"
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    response.direct_passthrough = False
+
+    body = response.get_data(as_text=True)
+
+    if "</body>" in body:
+        body = body.replace("</body>", LIVE_RELOAD_SCRIPT + "</body>", 1)
+    else:
+        body += LIVE_RELOAD_SCRIPT
+
+    response.set_data(body)
+
+    return response
+
+
+def notify_browsers(changed_paths):
+    global build_number, route_table_checked_at
+
+    # load the new route table, and clear the response cache, on the next request
+    route_table_checked_at = 0
+
+    with build_finished:
+        build_number += 1
+
+        build_finished.notify_all()
+
+
+def start_watching(jobs=1):
+    """
+    Rebuild the site in a background thread whenever a source file changes.
+    """
+    global watching
+
+    # imported here so the server can run without the site's build dependencies
+    import watch
+
+    watching = True
+
+    thread = threading.Thread(
+        target=watch.watch, kwargs={"on_rebuild": notify_browsers, "jobs": jobs}
+    )
+    thread.daemon = True
+    thread.start()
 
 
 if __name__ == "__main__":
-    app.run()
+    parser = argparse.ArgumentParser(description="Serve the static site.")
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rebuild pages when their source files change and reload open browsers",
+    )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes used to render pages when watching",
+    )
+
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=0,
+        help="megabytes of responses to keep in memory (0 turns the cache off)",
+    )
+
+    parser.add_argument("--port", type=int, default=5000)
+
+    args = parser.parse_args()
+
+    if args.cache_size > 0:
+        cache = response_cache.ResponseCache(args.cache_size * 1024 * 1024)
+
+    if args.watch:
+        start_watching(args.jobs)
+
+    app.run(port=args.port, threaded=True)
@@ -0,0 +1,26 @@
+import collections
+import datetime
+
+
+def post_day(post):
+    """
+    Return the day a post was published as YYYY-MM-DD, or "" if it has no date.
+    """
+    # full_date is always formatted as "%Y-%m-%d %H:%M:%S-00:00"
+    return post["full_date"][:10]
+
+
+def daily_counts(days_published, number_of_days):
+    """
+    Count how many posts were published on each of the last number_of_days days.
+
+    days_published is a list of YYYY-MM-DD strings. Counts are returned oldest first.
+    """
+    counts = collections.Counter(days_published)
+
+    today = datetime.datetime.now()
+
+    return [
+        counts[(today - datetime.timedelta(days=i)).strftime("%Y-%m-%d")]
+        for i in range(number_of_days - 1, -1, -1)
+    ]
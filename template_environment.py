@@ -0,0 +1,103 @@
+import datetime
+import os
+
+import frontmatter
+import jinja2
+
+BYTECODE_CACHE_DIR = ".letsjam/jinja"
+
+
+def list_archive_date(date):
+    if type(date) is str and "." in date:
+        date = date.replace(" ", "T")
+        date = datetime.datetime.strptime(date, "%Y-%m-%dT%H:%M:%S.%f")
+    elif type(date) is str:
+        date = date.replace(" ", "T")
+        date = datetime.datetime.strptime(date, "%Y-%m-%dT%H:%M:%S-00:00")
+
+    return date
+
+
+def long_date(date):
+    return list_archive_date(date).strftime("%B %d, %Y")
+
+
+def date_to_xml_string(date):
+    return list_archive_date(date).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def archive_date(date):
+    return list_archive_date(date).strftime("%Y/%m")
+
+
+class LayoutLoader(jinja2.BaseLoader):
+    """
+    Serves the layouts read into site_config["layouts"] with their front matter removed.
+    """
+
+    def __init__(self):
+        self.layouts = {}
+        self.metadata = {}
+
+    def register(self, layouts):
+        for name, source in layouts.items():
+            front_matter = frontmatter.loads(source)
+
+            # keep the compiled layout when a layout is registered again unchanged
+            if self.layouts.get("_layouts/" + name) != front_matter.content:
+                self.layouts["_layouts/" + name] = front_matter.content
+
+            self.metadata["_layouts/" + name] = front_matter.metadata
+
+    def get_source(self, environment, template):
+        if template not in self.layouts:
+            raise jinja2.TemplateNotFound(template)
+
+        source = self.layouts[template]
+
+        # a compiled layout is reused until the layout is registered again
+        return source, None, lambda: self.layouts.get(template) is source
+
+
+layout_loader = LayoutLoader()
+
+environment = jinja2.Environment(
+    loader=jinja2.ChoiceLoader(
+        [layout_loader, jinja2.FileSystemLoader(searchpath="./")]
+    ),
+    cache_size=-1,
+)
+
+# register filter
+environment.filters["long_date"] = long_date
+environment.filters["date_to_xml_string"] = date_to_xml_string
+environment.filters["archive_date"] = archive_date
+environment.filters["list_archive_date"] = list_archive_date
+
+
+def register_layouts(layouts):
+    """
+    Make the layouts in site_config["layouts"] available by name, i.e. "_layouts/post.html".
+    """
+    layout_loader.register(layouts)
+
+
+def get_layout(name):
+    """
+    Return the front matter and the compiled template of a layout, i.e. "post.html".
+
+    Each layout is compiled once and reused for every page that uses it.
+    """
+    path = "_layouts/" + name
+
+    return layout_loader.metadata[path], environment.get_template(path)
+
+
+def enable_bytecode_cache(directory=BYTECODE_CACHE_DIR):
+    """
+    Store compiled templates on disk so they do not need to be compiled on the next build.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    environment.bytecode_cache = jinja2.FileSystemBytecodeCache(directory)
@@ -0,0 +1,100 @@
+import os
+import time
+import traceback
+
+import app
+import build_manifest
+
+WATCHED_PATHS = ["_posts", "_layouts", "_includes", "templates", "config.yml"]
+
+POLL_INTERVAL = 0.25
+
+
+def snapshot(paths=WATCHED_PATHS):
+    """
+    Return the modification time and size of every file under the watched paths.
+    """
+    files = {}
+
+    for path in paths:
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+
+            continue
+
+        for root, _, file_names in os.walk(path):
+            for file_name in file_names:
+                file_path = root + "/" + file_name
+
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+
+                files[file_path] = (stat.st_mtime_ns, stat.st_size)
+
+    return files
+
+
+def changed_paths(before, after):
+    """
+    Return the files added, removed, or changed between two snapshots.
+    """
+    return {
+        path
+        for path in before.keys() | after.keys()
+        if before.get(path) != after.get(path)
+    }
+
+
+def watch(on_rebuild=None, jobs=1):
+    """
+    Build the site, then rebuild it every time a watched file changes.
+
+    Parsed pages, compiled layouts, and file hashes are kept in memory between
+    builds, so a rebuild only reads and renders what the changed files affect.
+    on_rebuild is called with the changed files after each successful rebuild.
+    """
+    # keep every loaded page in memory so unchanged files are not read again
+    app.page_cache = {}
+
+    # the first pass sees every file as new and makes a normal build
+    files = {}
+    manifest = None
+
+    while True:
+        current_files = snapshot()
+
+        changed = changed_paths(files, current_files)
+
+        if not changed:
+            time.sleep(POLL_INTERVAL)
+
+            continue
+
+        files = current_files
+
+        if manifest is not None:
+            print("Changed: " + ", ".join(sorted(changed)))
+
+            build_manifest.forget_changed_inputs(manifest, changed)
+
+        start = time.time()
+
+        try:
+            site_config = app.main(jobs=jobs, previous_manifest=manifest)
+        except Exception:
+            traceback.print_exc()
+
+            # the manifest on disk describes the last build that finished
+            manifest = None
+
+            continue
+
+        manifest = site_config["manifest"]
+
+        print(f"Built in {round((time.time() - start) * 1000)} ms")
+
+        if on_rebuild:
+            on_rebuild(changed)